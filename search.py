@@ -1,24 +1,68 @@
 import os
 import re
 import mmap
+import array
+import ctypes
+import ctypes.util
 import time
 import multiprocessing
 import psutil
 import humanize
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import platform
-import cpuinfo
 from pathlib import Path
 import sys
 import stat
+import shutil
+import threading
+import pickle
+import hashlib
+from collections import deque
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class Config:
-    # Автоматическая настройка потоков
-    MAX_WORKERS = min(multiprocessing.cpu_count() * 2, 32)
+    # Автоматическая настройка потоков (ProcessPoolExecutor в Windows не принимает больше 61)
+    MAX_WORKERS = min(multiprocessing.cpu_count(), 61)
+    # Потоки вместо процессов (для сетевых дисков, где упираемся в I/O)
+    USE_THREADS = False
+    # Потоки предзагрузки страниц файлов в кэш ОС
+    PREFETCH_WORKERS = 8
+    # На сколько частей предзагрузка может опережать поиск
+    PREFETCH_AHEAD = 16
+    PREFETCH_READ_SIZE = 1024 * 1024
+    # Потоки обхода папок и сколько папок отдаётся им за один проход
+    SCAN_WORKERS = 8
+    SCAN_BATCH = 64
+    # Объём упреждающего чтения в начале каждой части
+    READAHEAD_SIZE = 64 * 1024 * 1024
+    # Проверка начала файла, чтобы отсеять бинарные файлы с расширением .txt
+    PROBE_SIZE = 512
+    BINARY_RATIO = 0.3
+    # С какой длины запроса искать через memmem из libc
+    MEMMEM_MIN_NEEDLE = 4
+    # Поиск без учёта регистра (через Hyperscan, если он установлен)
+    IGNORE_CASE = False
+    # Блум-фильтры триграмм для небольших файлов (нужен numpy), хранятся между запусками
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "txtsearchpro")
+    BLOOM_MAX_SIZE = 16 * 1024
+    BLOOM_BITS_PER_TRIGRAM = 6
+    BLOOM_MIN_BITS = 512
+    # Файлы меньше этого размера читаются в буфер, а не отображаются через mmap
+    SMALL_FILE_SIZE = 64 * 1024
     RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
     MEMORY_LIMIT = 0.9
-    CHUNK_SIZE = 1000000
+    # Файлы крупнее делятся на части, которые ищутся параллельно
+    CHUNK_SIZE = 64 * 1024 * 1024
     
     COLORS = {
         'header': '\033[96m\033[1m',
@@ -30,23 +74,309 @@ class Config:
         'reset': '\033[0m'
     }
 
+CONTROL_BYTES = bytes(set(range(32)) - set(b'\t\n\r\f\v\b\x1b')) + b'\x7f'
+UTF16_BOMS = (b'\xff\xfe', b'\xfe\xff')
+
+def load_memmem():
+    if os.name != 'posix':
+        return None
+    try:
+        memmem = ctypes.CDLL(ctypes.util.find_library('c')).memmem
+    except (OSError, AttributeError):
+        return None
+    memmem.restype = ctypes.c_void_p
+    memmem.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_char_p, ctypes.c_size_t]
+    return memmem
+
+MEMMEM = load_memmem()
+
+def use_memmem(needle):
+    return MEMMEM is not None and len(needle) >= Config.MEMMEM_MIN_NEEDLE
+
+def is_text_file(path):
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        probe = os.read(fd, Config.PROBE_SIZE)
+    finally:
+        os.close(fd)
+    if not probe:
+        return True
+    # Запрос ищется в UTF-8, в UTF-16 он не совпадёт
+    if b'\x00' in probe or probe.startswith(UTF16_BOMS):
+        return False
+    control = len(probe) - len(probe.translate(None, CONTROL_BYTES))
+    return control / len(probe) <= Config.BINARY_RATIO
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def list_dir(folder):
+    # Тип записи scandir отдаёт без лишних вызовов, но на каждый .txt файл всё равно приходится
+    # stat (на Linux DirEntry.stat() — отдельный вызов) и open/read/close для проверки начала файла
+    dirs, files, errors = [], [], []
+    # Время папки берётся до чтения, чтобы изменения во время обхода сбросили кэш
+    mtime = get_mtime(folder)
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.name.lower().endswith('.txt'):
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime_ns, is_text_file(entry.path)))
+                except OSError as e:
+                    errors.append((entry.name, e))
+    except OSError as e:
+        errors.append((folder, e))
+    return dirs, files, errors, mtime
+
+prefetch_buffers = threading.local()
+
+def prefetch_part(path, start, end, stop):
+    # Подтягивает часть файла в кэш ОС; stop прерывает чтение, когда поиск закончен.
+    # fadvise и readinto отпускают GIL, поэтому потоки держат несколько запросов к диску
+    # одновременно и не тормозят основной поток, в отличие от обхода страниц через mmap
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if end <= start:
+                return
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), start, end - start, os.POSIX_FADV_WILLNEED)
+            buf = getattr(prefetch_buffers, 'buf', None)
+            if buf is None:
+                buf = prefetch_buffers.buf = bytearray(Config.PREFETCH_READ_SIZE)
+            f.seek(start)
+            pos = start
+            while pos < end and not stop.is_set():
+                with memoryview(buf) as view:
+                    read = f.readinto(view[:min(len(buf), end - pos)])
+                if not read:
+                    break
+                pos += read
+    except (OSError, ValueError):
+        pass
+
+def memmem_offsets(buf, needle, start, end, base):
+    # memmem требует адрес буфера, поэтому буфер должен быть доступен на запись
+    offsets = array.array('Q')
+    view = (ctypes.c_char * len(buf)).from_buffer(buf)
+    try:
+        addr = ctypes.addressof(view)
+        pos = start
+        while end - pos >= len(needle):
+            found = MEMMEM(addr + pos, end - pos, needle, len(needle))
+            if not found:
+                break
+            pos = found - addr
+            offsets.append(base + pos)
+            pos += 1
+    finally:
+        del view
+    return offsets
+
+def find_offsets(buf, needle, start=0, end=None, base=0):
+    # Сам перебор байтов выполняет find() на C, в Python остаётся только цикл по совпадениям
+    if end is None:
+        end = len(buf)
+    end = min(end, len(buf))
+    if use_memmem(needle) and buf:
+        with memoryview(buf) as view:
+            writable = not view.readonly
+        if writable:
+            return memmem_offsets(buf, needle, start, end, base)
+    offsets = array.array('Q')
+    pos = buf.find(needle, start, end)
+    while pos != -1:
+        offsets.append(base + pos)
+        pos = buf.find(needle, pos + 1, end)
+    return offsets
+
+caseless_matchers = threading.local()
+
+def case_variants(char):
+    return sorted({char, char.lower(), char.upper()})
+
+def match_span(needle, ignore_case):
+    # Наибольшая длина совпадения в байтах. Без учёта регистра варианты бывают длиннее
+    # запроса: 'İ'.lower() занимает 3 байта вместо 2, 'ß'.upper() == 'SS'
+    if not ignore_case:
+        return len(needle)
+    return sum(max(len(variant.encode('utf-8')) for variant in case_variants(char))
+               for char in needle.decode('utf-8'))
+
+def caseless_pattern(needle):
+    # Каждый символ заменяется группой его вариантов регистра в UTF-8, поэтому работает и кириллица
+    parts = []
+    for char in needle.decode('utf-8'):
+        variants = case_variants(char)
+        parts.append(b'(?:' + b'|'.join(
+            b''.join(b'\\x%02x' % byte for byte in variant.encode('utf-8')) for variant in variants
+        ) + b')')
+    return b''.join(parts)
+
+def get_caseless_matcher(needle):
+    # База Hyperscan не сериализуется и не потокобезопасна, поэтому своя в каждом потоке
+    cache = caseless_matchers.__dict__.setdefault('cache', {})
+    if needle not in cache:
+        pattern = caseless_pattern(needle)
+        if hyperscan is not None:
+            matcher = hyperscan.Database()
+            matcher.compile(expressions=[pattern], flags=[hyperscan.HS_FLAG_SOM_LEFTMOST])
+        else:
+            matcher = re.compile(b'(?=' + pattern + b')')
+        cache[needle] = matcher
+    return cache[needle]
+
+def find_offsets_caseless(buf, needle, start=0, end=None, base=0, limit=None):
+    # Длина совпадения не фиксирована, поэтому окно [start, end) может захватить совпадения
+    # следующей части; limit отсекает всё, что начинается с него и дальше
+    matcher = get_caseless_matcher(needle)
+    if end is None:
+        end = len(buf)
+    if limit is None:
+        limit = end
+    offsets = array.array('Q')
+    if hyperscan is None:
+        for match in matcher.finditer(buf, start, end):
+            if match.start() >= limit:
+                break
+            offsets.append(base + match.start())
+        return offsets
+    def on_match(_id, match_start, _match_end, _flags, _context):
+        if start + match_start < limit:
+            offsets.append(base + start + match_start)
+    # Hyperscan читает буфер напрямую, без копии части
+    view = memoryview(buf)[start:end]
+    try:
+        matcher.scan(view, match_event_handler=on_match)
+    finally:
+        view.release()
+    # Hyperscan сообщает совпадения в порядке их концов, а варианты разной длины могут его нарушить
+    return array.array('Q', sorted(offsets))
+
+BLOOM_SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D)
+
+def needle_hashes(needle):
+    # Хэши не зависят от размера фильтра, номер бита берётся по модулю при проверке
+    hashes = set()
+    for i in range(len(needle) - 2):
+        value = int.from_bytes(needle[i:i+3], 'little')
+        hashes.update((value * seed) >> 16 for seed in BLOOM_SEEDS)
+    return hashes
+
+def build_bloom(data):
+    # Триграммы и их хэши считаются векторно, размер фильтра подбирается под число различных
+    # триграмм, чтобы доля ложных срабатываний не зависела от размера и плотности текста
+    values = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    trigrams = np.sort(values[:-2] | values[1:-1] << 8 | values[2:] << 16)
+    if len(trigrams):
+        trigrams = trigrams[np.concatenate(([True], trigrams[1:] != trigrams[:-1]))]
+    trigrams = trigrams.astype(np.uint64)
+    nbits = max(Config.BLOOM_MIN_BITS, -(-len(trigrams) * Config.BLOOM_BITS_PER_TRIGRAM // 8) * 8)
+    bits = np.zeros(nbits, dtype=bool)
+    for seed in BLOOM_SEEDS:
+        bits[((trigrams * np.uint64(seed)) >> np.uint64(16)) % np.uint64(nbits)] = True
+    return np.packbits(bits, bitorder='little').tobytes()
+
+def bloom_contains(bloom, hashes):
+    nbits = len(bloom) * 8
+    return all(bloom[(h % nbits) >> 3] & (1 << (h % nbits & 7)) for h in hashes)
+
+read_buffers = threading.local()
+
+def get_read_buffer():
+    buf = getattr(read_buffers, 'buf', None)
+    if buf is None:
+        buf = read_buffers.buf = bytearray(Config.SMALL_FILE_SIZE)
+    return buf
+
+def search_file(path, needle, start, end, ignore_case=False, with_bloom=False):
+    # Ищет совпадения, начинающиеся в [start, end); окно захватывает на байт меньше самого
+    # длинного возможного совпадения из следующей части, чтобы не терять совпадения на стыке.
+    # end=None: последняя часть файла, ищется до текущего конца файла.
+    # with_bloom: файл целиком в окне, вернуть ещё и его блум-фильтр (mtime_ns, size, bloom)
+    matches = array.array('Q')
+    bloom = None
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            if end is None:
+                end = size
+            offset = start - start % mmap.ALLOCATIONGRANULARITY
+            length = min(end + match_span(needle, ignore_case) - 1, size) - offset
+            if length <= 0:
+                return (path, matches, "", None)
+            scan = find_offsets_caseless if ignore_case else find_offsets
+            if size < Config.SMALL_FILE_SIZE:
+                # Для маленьких файлов mmap дороже одного read в переиспользуемый буфер
+                buf = get_read_buffer()
+                view = memoryview(buf)[:size]
+                try:
+                    size = f.readinto(view)
+                finally:
+                    view.release()
+                matches = scan(buf, needle, 0, size)
+                if with_bloom:
+                    bloom = (st.st_mtime_ns, size, build_bloom(bytes(buf[:size])))
+                return (path, matches, "", bloom)
+            # Копия при записи нужна только для memmem; сама часть ничем не меняется
+            access = mmap.ACCESS_COPY if use_memmem(needle) and not ignore_case else mmap.ACCESS_READ
+            with mmap.mmap(f.fileno(), length, access=access, offset=offset) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                    mm.madvise(mmap.MADV_WILLNEED, 0, min(length, Config.READAHEAD_SIZE))
+                if ignore_case:
+                    matches = scan(mm, needle, start - offset, length, base=offset, limit=end - offset)
+                else:
+                    matches = scan(mm, needle, start - offset, length, base=offset)
+                if with_bloom and length == size:
+                    bloom = (st.st_mtime_ns, size, build_bloom(mm[:]))
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_DONTNEED)
+    except Exception as e:
+        return (path, array.array('Q'), str(e), None)
+    return (path, matches, "", bloom)
+
 class TextSearchEngine:
     def __init__(self):
         self.stats = {
             'files_processed': 0,
             'matches_found': 0,
             'total_size': 0,
+            'skipped': 0,
+            'filtered': 0,
             'errors': 0
         }
         self.query = None
-        self.cpu_info = self.get_cpu_info()
+        self._needle = None
+        self._file_cache = {}
+        self.cpu_info = None
         self.setup_results_dir()
 
+    def get_cpu_name(self):
+        # Без py-cpuinfo: он запускает подпроцесс и задерживает старт на сотни мс
+        if os.name == 'nt' and os.environ.get('PROCESSOR_IDENTIFIER'):
+            return os.environ['PROCESSOR_IDENTIFIER']
+        try:
+            with open('/proc/cpuinfo', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if line.startswith('model name'):
+                        return line.split(':', 1)[1].strip()
+        except OSError:
+            pass
+        return platform.processor()
+
     def get_cpu_info(self):
         try:
-            info = cpuinfo.get_cpu_info()
             return {
-                'name': info.get('brand_raw', platform.processor()),
+                'name': self.get_cpu_name(),
                 'cores': psutil.cpu_count(logical=False),
                 'threads': psutil.cpu_count(logical=True),
                 'freq': f"{psutil.cpu_freq().current:.2f} GHz" if psutil.cpu_freq() else 'N/A'
@@ -90,46 +420,92 @@ class TextSearchEngine:
         except:
             return False
 
-    def search_file(self, file_info):
-        matches = []
-        try:
-            with open(file_info['path'], 'r', encoding='utf-8', errors='ignore') as f:
-                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-                    for match in re.finditer(re.escape(self.query).encode('utf-8'), mm):
-                        context = mm[max(0, match.start()-50):match.end()+50].decode('utf-8', errors='replace')
-                        matches.append({
-                            'file': file_info['path'],
-                            'context': context.strip(),
-                            'position': match.start()
-                        })
-        except Exception as e:
-            self.stats['errors'] += 1
-            return (file_info['path'], [], str(e))
-        return (file_info['path'], matches, "")
-
-    def save_results(self, matches):
-        if not matches:
-            return
-
+    def get_result_file(self):
         safe_query = re.sub(r'[\\/*?:"<>|]', '_', self.query)[:50]
-        result_file = os.path.join(Config.RESULTS_DIR, f"results_{safe_query}.txt")
+        return os.path.join(Config.RESULTS_DIR, f"results_{safe_query}.txt")
+
+    def save_results(self, part_file, total):
+        # Совпадения уже записаны в part_file по ходу поиска, здесь добавляется заголовок
+        result_file = self.get_result_file()
         
         try:
+            if not total:
+                return
+
             self.ensure_write_permission(result_file)
             
             with open(result_file, 'w', encoding='utf-8') as f:
                 f.write(f"Результаты поиска: '{self.query}'\n")
-                f.write(f"Всего совпадений: {len(matches)}\n{'='*50}\n")
-                for match in matches:
-                    f.write(f"\nФайл: {match['file']}\nПозиция: {match['position']}\n")
-                    f.write(f"Контекст: {match['context']}\n{'='*50}\n")
+                f.write(f"Всего совпадений: {total}\n{'='*50}\n")
+            # Побайтовое копирование: чтение в текстовом режиме заменило бы \r\n и \r в контексте
+            with open(result_file, 'ab') as f, open(part_file, 'rb') as part:
+                shutil.copyfileobj(part, f)
             
             print(f"{Config.COLORS['success']}✅ Результаты сохранены в: {result_file}{Config.COLORS['reset']}")
         except Exception as e:
             print(f"{Config.COLORS['error']}❌ Ошибка сохранения: {e}{Config.COLORS['reset']}")
+        finally:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+    def get_bloom_cache_file(self, folder):
+        # Свой файл кэша на каждую папку поиска, чтобы не переписывать фильтры других папок
+        name = hashlib.sha1(os.path.abspath(folder).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(Config.CACHE_DIR, f"blooms_{name}.pickle")
+
+    def load_blooms(self, folder):
+        try:
+            with open(self.get_bloom_cache_file(folder), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return {}
+
+    def save_blooms(self, folder, blooms):
+        cache_file = self.get_bloom_cache_file(folder)
+        try:
+            os.makedirs(Config.CACHE_DIR, exist_ok=True)
+            with open(cache_file + '.tmp', 'wb') as f:
+                pickle.dump(blooms, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_file + '.tmp', cache_file)
+        except OSError as e:
+            print(f"{Config.COLORS['warning']}⚠ Ошибка сохранения кэша фильтров: {e}{Config.COLORS['reset']}")
+
+    def bloom_rejects(self, file, hashes, blooms):
+        # Файл отбрасывается, только если фильтр исключает запрос и файл не менялся с его построения
+        entry = blooms.get(file['path'])
+        if not hashes or entry is None or bloom_contains(entry[2], hashes):
+            return False
+        try:
+            st = os.stat(file['path'])
+        except OSError:
+            return False
+        return (st.st_mtime_ns, st.st_size) == entry[:2]
+
+    def needs_bloom(self, file, blooms):
+        if np is None or file['size'] > Config.BLOOM_MAX_SIZE:
+            return False
+        entry = blooms.get(file['path'])
+        return entry is None or entry[:2] != (file['mtime'], file['size'])
+
+    def write_matches(self, f, path, offsets):
+        # Контекст собирается только здесь, воркеры возвращают лишь смещения
+        needle_len = len(self._needle)
+        try:
+            with open(path, 'rb') as src:
+                with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for pos in offsets:
+                        context = mm[max(0, pos-50):pos+needle_len+50].decode('utf-8', errors='replace')
+                        f.write(f"\nФайл: {path}\nПозиция: {pos}\n")
+                        f.write(f"Контекст: {context.strip()}\n{'='*50}\n")
+        except (OSError, ValueError) as e:
+            self.stats['errors'] += 1
+            print(f"{Config.COLORS['warning']}⚠ Ошибка записи совпадений из {path}: {e}{Config.COLORS['reset']}")
 
     def run_search(self, folder):
         self.print_header()
+        # Счётчики относятся к одному поиску, размеры папки заполнит get_folder_stats
+        for key in ('files_processed', 'matches_found', 'filtered', 'errors'):
+            self.stats[key] = 0
         
         files = self.get_folder_stats(folder)
         if not files:
@@ -139,68 +515,186 @@ class TextSearchEngine:
         print(f"{Config.COLORS['info']}▪ Папка: {folder}")
         print(f"{Config.COLORS['info']}▪ Файлов: {len(files)}")
         print(f"{Config.COLORS['info']}▪ Общий размер: {humanize.naturalsize(self.stats['total_size'])}")
+        print(f"{Config.COLORS['info']}▪ Пропущено бинарных: {self.stats['skipped']}")
         print(f"{'='*80}{Config.COLORS['reset']}\n")
 
         self.query = input(f"{Config.COLORS['header']}🔍 Введите поисковый запрос: {Config.COLORS['reset']}").strip()
         if not self.query:
             print(f"{Config.COLORS['error']}❌ Запрос не может быть пустым!{Config.COLORS['reset']}")
             return
+        self._needle = self.query.encode('utf-8')
 
         start_time = time.time()
-        all_matches = []
 
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            futures = [executor.submit(self.search_file, file) for file in files]
-            
-            for future in tqdm(as_completed(futures), total=len(files),
-                            desc=f"{Config.COLORS['progress']}Поиск (CPU)",
-                            unit="файл"):
-                path, matches, error = future.result()
-                self.stats['files_processed'] += 1
-                
-                if error:
-                    print(f"{Config.COLORS['warning']}⚠ {error}{Config.COLORS['reset']}")
+        # Фильтры живут только на время поиска; в кэше остаются лишь файлы из текущего списка
+        blooms = self.load_blooms(folder)
+        listed = {file['path'] for file in files}
+        blooms_changed = len(blooms) != len(listed & blooms.keys())
+        blooms = {path: entry for path, entry in blooms.items() if path in listed}
+        hashes = set() if Config.IGNORE_CASE else needle_hashes(self._needle)
+        total_files = len(files)
+        filtered = [file for file in files if self.bloom_rejects(file, hashes, blooms)]
+        if filtered:
+            rejected = {file['path'] for file in filtered}
+            files = [file for file in files if file['path'] not in rejected]
+            self.stats['filtered'] += len(filtered)
+            self.stats['files_processed'] += len(filtered)
+
+        # Крупные файлы первыми, чтобы они не оставались в хвосте очереди
+        files.sort(key=lambda file: file['size'], reverse=True)
+
+        tasks = []
+        prefetch_queue = deque()
+        for file in files:
+            with_bloom = self.needs_bloom(file, blooms)
+            # Последняя часть идёт до фактического конца файла: размер в списке мог устареть
+            starts = range(0, max(file['size'], 1), Config.CHUNK_SIZE)
+            for index, start in enumerate(starts):
+                end = start + Config.CHUNK_SIZE if start != starts[-1] else None
+                tasks.append((file['path'], index, start, end, with_bloom))
+                if file['size'] >= Config.SMALL_FILE_SIZE:
+                    prefetch_queue.append((len(tasks) - 1, file['path'], start, end))
+        # Части файла записываются по порядку смещений; пришедшие раньше своей очереди ждут в held
+        parts_total = {file['path']: 0 for file in files}
+        for task in tasks:
+            parts_total[task[0]] += 1
+        next_part = dict.fromkeys(parts_total, 0)
+        held = {}
+
+        # Предзагрузка опережает поиск не больше чем на PREFETCH_AHEAD частей,
+        # иначе на корпусе больше ОЗУ она вытеснит страницы до того, как их прочтут.
+        # Отсчёт идёт от границы выдачи: воркеры берут задачи по порядку, поэтому части
+        # до completed + MAX_WORKERS уже ищутся и прогревать их поздно
+        stop_prefetch = threading.Event()
+        prefetcher = ThreadPoolExecutor(max_workers=Config.PREFETCH_WORKERS)
+        def prefetch_ahead(completed):
+            frontier = completed + Config.MAX_WORKERS
+            while prefetch_queue and prefetch_queue[0][0] < frontier + Config.PREFETCH_AHEAD:
+                position, path, start, end = prefetch_queue.popleft()
+                if position >= frontier:
+                    prefetcher.submit(prefetch_part, path, start, end, stop_prefetch)
+
+        # Совпадения пишутся на диск сразу, в памяти держится только одна часть
+        part_file = self.get_result_file() + '.part'
+        found = 0
+        pool = ThreadPoolExecutor if Config.USE_THREADS else ProcessPoolExecutor
+        completed = 0
+        try:
+            prefetch_ahead(completed)
+            with pool(max_workers=Config.MAX_WORKERS) as executor, \
+                    open(part_file, 'w', encoding='utf-8') as out:
+                futures = {executor.submit(search_file, path, self._needle, start, end,
+                                           Config.IGNORE_CASE, with_bloom): index
+                           for path, index, start, end, with_bloom in tasks}
                 
-                if matches:
+                for future in tqdm(as_completed(futures), total=len(tasks),
+                                desc=f"{Config.COLORS['progress']}Поиск (CPU)",
+                                unit="часть"):
+                    completed += 1
+                    prefetch_ahead(completed)
+                    path, matches, error, bloom = future.result()
+                    if bloom:
+                        blooms[path] = bloom
+                        blooms_changed = True
+                    
+                    if error:
+                        self.stats['errors'] += 1
+                        print(f"{Config.COLORS['warning']}⚠ {error}{Config.COLORS['reset']}")
+                    
                     self.stats['matches_found'] += len(matches)
-                    all_matches.extend(matches)
+                    found += len(matches)
+                    waiting = held.setdefault(path, {})
+                    waiting[futures[future]] = matches
+                    while next_part[path] in waiting:
+                        offsets = waiting.pop(next_part[path])
+                        if offsets:
+                            self.write_matches(out, path, offsets)
+                        next_part[path] += 1
+                    if next_part[path] == parts_total[path]:
+                        del held[path]
+                        self.stats['files_processed'] += 1
+        except BaseException:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            raise
+        finally:
+            stop_prefetch.set()
+            prefetcher.shutdown(wait=False, cancel_futures=True)
 
-        self.save_results(all_matches)
+        if blooms_changed:
+            self.save_blooms(folder, blooms)
+        self.save_results(part_file, found)
         
         print(f"\n{' Статистика ':=^80}")
-        print(f"{Config.COLORS['info']}▪ Обработано: {self.stats['files_processed']}/{len(files)} файлов")
+        print(f"{Config.COLORS['info']}▪ Обработано: {self.stats['files_processed']}/{total_files} файлов")
+        print(f"{Config.COLORS['info']}▪ Отсеяно фильтром: {self.stats['filtered']}")
         print(f"{Config.COLORS['info']}▪ Найдено совпадений: {self.stats['matches_found']}")
         print(f"{Config.COLORS['info']}▪ Ошибок: {self.stats['errors']}")
         print(f"{Config.COLORS['info']}▪ Время: {time.time() - start_time:.2f} сек")
         print(f"{Config.COLORS['info']}▪ Памяти использовано: {humanize.naturalsize(psutil.Process().memory_info().rss)}")
         print(f"{'='*80}{Config.COLORS['reset']}")
 
+    def walk_txt_files(self, folder, dir_mtimes):
+        # Обход в ширину: пачка папок читается параллельно, чтобы загрузить очередь диска.
+        # Время изменения каждой папки складывается в dir_mtimes для проверки кэша
+        queue = deque([folder])
+        with ThreadPoolExecutor(max_workers=Config.SCAN_WORKERS) as executor:
+            while queue:
+                batch = [queue.popleft() for _ in range(min(len(queue), Config.SCAN_BATCH))]
+                for path, (dirs, files, errors, mtime) in zip(batch, executor.map(list_dir, batch)):
+                    dir_mtimes[path] = mtime
+                    queue.extend(dirs)
+                    for name, e in errors:
+                        print(f"{Config.COLORS['warning']}⚠ Ошибка доступа к {name}: {e}{Config.COLORS['reset']}")
+                    yield from files
+
+    def listing_is_fresh(self, dir_mtimes):
+        # Добавление, удаление и переименование файлов меняют время папки, в которой они лежат
+        with ThreadPoolExecutor(max_workers=Config.SCAN_WORKERS) as executor:
+            current = executor.map(get_mtime, dir_mtimes)
+            return all(mtime is not None and mtime == cached
+                       for mtime, cached in zip(current, dir_mtimes.values()))
+
     def get_folder_stats(self, folder):
+        # Список файлов переиспользуется, пока не изменилась ни одна папка в дереве.
+        # Изменение содержимого файлов здесь не видно, поэтому поиск сам читает файлы до конца
+        cache_key = os.path.abspath(folder)
+        if cache_key in self._file_cache:
+            dir_mtimes, file_list, total_size, skipped = self._file_cache[cache_key]
+            if self.listing_is_fresh(dir_mtimes):
+                self.stats['total_size'], self.stats['skipped'] = total_size, skipped
+                return list(file_list)
+            del self._file_cache[cache_key]
+
         file_list = []
         total_size = 0
+        skipped = 0
+        dir_mtimes = {}
         
-        for root, _, files in os.walk(folder):
-            for file in files:
-                if file.lower().endswith('.txt'):
-                    path = os.path.join(root, file)
-                    try:
-                        size = os.path.getsize(path)
-                        file_list.append({'path': path, 'size': size})
-                        total_size += size
-                    except Exception as e:
-                        print(f"{Config.COLORS['warning']}⚠ Ошибка доступа к {file}: {e}{Config.COLORS['reset']}")
+        for path, size, mtime, is_text in self.walk_txt_files(folder, dir_mtimes):
+            if not is_text:
+                skipped += 1
+                continue
+            file_list.append({'path': path, 'size': size, 'mtime': mtime})
+            total_size += size
         
         self.stats['total_size'] = total_size
+        self.stats['skipped'] = skipped
+        if dir_mtimes.get(folder) is not None:
+            self._file_cache[cache_key] = (dir_mtimes, list(file_list), total_size, skipped)
         return file_list
 
     def print_header(self):
         os.system('cls' if os.name == 'nt' else 'clear')
+        if self.cpu_info is None:
+            self.cpu_info = self.get_cpu_info()
         print(f"{Config.COLORS['header']}\n{' TXT SEARCH PRO ':=^80}")
         print(f"{Config.COLORS['info']}▪ Процессор: {self.cpu_info['name']}")
         print(f"{Config.COLORS['info']}▪ Ядер/Потоков: {self.cpu_info['cores']}/{self.cpu_info['threads']}")
         print(f"{Config.COLORS['info']}▪ Частота: {self.cpu_info['freq']}")
         print(f"{Config.COLORS['info']}▪ ОЗУ: {humanize.naturalsize(psutil.virtual_memory().total)}")
-        print(f"{Config.COLORS['info']}▪ Потоков поиска: {Config.MAX_WORKERS}")
+        print(f"{Config.COLORS['info']}▪ {'Потоков' if Config.USE_THREADS else 'Процессов'} поиска: {Config.MAX_WORKERS}")
+        print(f"{Config.COLORS['info']}▪ Без учёта регистра: {'да' if Config.IGNORE_CASE else 'нет'}")
         print(f"{Config.COLORS['info']}▪ Папка результатов: {Config.RESULTS_DIR}")
         print(f"{'='*80}{Config.COLORS['reset']}\n")
 